@@ -2,11 +2,10 @@
 Configuration for CarbonVault Data Pipeline
 """
 import os
+from functools import lru_cache
 from pathlib import Path
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from typing import Dict
+from dotenv import find_dotenv, load_dotenv
 
 # Base paths
 BASE_DIR = Path(__file__).parent
@@ -17,29 +16,52 @@ LOGS_DIR = BASE_DIR / "logs"
 DATA_DIR.mkdir(exist_ok=True)
 LOGS_DIR.mkdir(exist_ok=True)
 
+
+@lru_cache(maxsize=None)
+def load_env() -> Dict[str, str]:
+    """
+    Load .env once and snapshot the environment
+    
+    Like load_dotenv() on its own, .env is searched for upward from this
+    file (so the repository root .env is found) and exported to os.environ
+    without overriding variables already set; libraries reading the
+    environment, such as requests with HTTPS_PROXY, see its values too.
+    """
+    load_dotenv(find_dotenv())
+    return dict(os.environ)
+
+
+def getenv(key: str, default: str = "") -> str:
+    """Look up a configuration value from the cached environment"""
+    return load_env().get(key, default)
+
+
 # API Configuration
 class APIConfig:
     # Satellite Imagery APIs
-    PLANET_LABS_API_URL = os.getenv("PLANET_LABS_API_URL", "https://api.planet.com/data/v1")
-    PLANET_LABS_API_KEY = os.getenv("PLANET_LABS_API_KEY", "")
+    PLANET_LABS_API_URL = getenv("PLANET_LABS_API_URL", "https://api.planet.com/data/v1")
+    PLANET_LABS_API_KEY = getenv("PLANET_LABS_API_KEY", "")
+    PLANET_LABS_MAX_CONCURRENCY = int(getenv("PLANET_LABS_MAX_CONCURRENCY", "4"))  # Per-key request cap
     
-    SENTINEL2_API_URL = os.getenv("SENTINEL2_API_URL", "https://apihub.copernicus.eu/apihub")
-    SENTINEL2_API_KEY = os.getenv("SENTINEL2_API_KEY", "")
+    SENTINEL2_API_URL = getenv("SENTINEL2_API_URL", "https://apihub.copernicus.eu/apihub")
+    SENTINEL2_API_KEY = getenv("SENTINEL2_API_KEY", "")
+    SENTINEL2_MAX_CONCURRENCY = int(getenv("SENTINEL2_MAX_CONCURRENCY", "8"))
     
-    LANDSAT_API_URL = os.getenv("LANDSAT_API_URL", "https://landsatlook.usgs.gov/stac-server")
-    LANDSAT_API_KEY = os.getenv("LANDSAT_API_KEY", "")
+    LANDSAT_API_URL = getenv("LANDSAT_API_URL", "https://landsatlook.usgs.gov/stac-server")
+    LANDSAT_API_KEY = getenv("LANDSAT_API_KEY", "")
+    LANDSAT_MAX_CONCURRENCY = int(getenv("LANDSAT_MAX_CONCURRENCY", "4"))  # Unauthenticated USGS tier
     
     # IoT Sensor APIs
-    AIR_QUALITY_API_URL = os.getenv("AIR_QUALITY_API_URL", "https://api.openaq.org/v2")
-    AIR_QUALITY_API_KEY = os.getenv("AIR_QUALITY_API_KEY", "")
+    AIR_QUALITY_API_URL = getenv("AIR_QUALITY_API_URL", "https://api.openaq.org/v2")
+    AIR_QUALITY_API_KEY = getenv("AIR_QUALITY_API_KEY", "")
     
     # Energy Meter APIs
-    ENERGY_METER_API_URL = os.getenv("ENERGY_METER_API_URL", "")
-    ENERGY_METER_API_KEY = os.getenv("ENERGY_METER_API_KEY", "")
+    ENERGY_METER_API_URL = getenv("ENERGY_METER_API_URL", "")
+    ENERGY_METER_API_KEY = getenv("ENERGY_METER_API_KEY", "")
     
     # Industrial Emission Monitors
-    EMISSION_MONITOR_API_URL = os.getenv("EMISSION_MONITOR_API_URL", "")
-    EMISSION_MONITOR_API_KEY = os.getenv("EMISSION_MONITOR_API_KEY", "")
+    EMISSION_MONITOR_API_URL = getenv("EMISSION_MONITOR_API_URL", "")
+    EMISSION_MONITOR_API_KEY = getenv("EMISSION_MONITOR_API_KEY", "")
 
 # Data Processing Configuration
 class ProcessingConfig:
@@ -75,10 +97,13 @@ class PipelineConfig:
     # Rate limiting
     REQUESTS_PER_SECOND = 10
     
-    # Batch processing
-    BATCH_SIZE = 100
+    # Concurrent satellite fetches in satellite.fetch_all
+    MAX_SATELLITE_WORKERS = int(getenv("MAX_SATELLITE_WORKERS", "8"))
+    
+    # On-disk cache for responses of public, idempotent endpoints
+    HTTP_CACHE_DB = DATA_DIR / "http_cache.db"
     
     # Logging
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVEL = getenv("LOG_LEVEL", "INFO")
     LOG_FILE = LOGS_DIR / "pipeline.log"
 
@@ -1,32 +1,41 @@
 """
 Main Data Pipeline Orchestrator
 Coordinates data fetching, processing, and storage
+
+Run from the data-pipeline directory with: python -m pipeline.main
 """
 import asyncio
+import itertools
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Dict, List
 from loguru import logger
-import sys
-from pathlib import Path
-
-# Add parent directory to path
-parent_dir = Path(__file__).parent.parent
-sys.path.insert(0, str(parent_dir))
+import requests
 
 from config import PipelineConfig
-from pipeline.sources.satellite import get_satellite_sources
-from pipeline.sources.iot_sensors import get_iot_sources
-from pipeline.processors.normalizer import DataNormalizer
-from pipeline.storage.storage import DataStorage
+from .sources.satellite import get_satellite_sources
+from .sources.iot_sensors import get_iot_sources
+from .sources.http import RESPONSE_CACHE, create_session
+from .processors.normalizer import NORMALIZER, DataNormalizer
+from .storage.storage import STORAGE
 
 
 class DataPipeline:
     """Main data pipeline orchestrator"""
     
-    def __init__(self):
+    def __init__(self, validate: bool = False):
+        """
+        Args:
+            validate: Re-validate a sample of normalized records against the
+                CarbonDataPoint schema
+        """
         self.config = PipelineConfig
-        self.normalizer = DataNormalizer()
-        self.storage = DataStorage()
+        self.normalizer = DataNormalizer(validate=True) if validate else NORMALIZER
+        self.storage = STORAGE
+        
+        # Data sources are built once and share one pooled HTTP session
+        self.session = self._create_session()
+        self.satellite_sources = get_satellite_sources(self.session)
+        self.iot_sources = get_iot_sources(self.session)
         
         # Setup logging
         logger.add(
@@ -36,6 +45,65 @@ class DataPipeline:
             level=self.config.LOG_LEVEL
         )
     
+    def _create_session(self) -> requests.Session:
+        """Create an HTTP session with a connection pool sized for concurrent fetches"""
+        return create_session(
+            pool_connections=self.config.REQUESTS_PER_SECOND,
+            pool_maxsize=self.config.REQUESTS_PER_SECOND * 4
+        )
+    
+    def close(self):
+        """Release HTTP connections, the response cache and the storage database"""
+        for source in self.satellite_sources + self.iot_sources:
+            source.close()
+        self.session.close()
+        RESPONSE_CACHE.close()
+        self.storage.close()
+    
+    async def _fetch_one(self, source, limit: asyncio.Semaphore, **kwargs) -> List[Dict]:
+        """Fetch and normalize data from a single source, returning [] on failure"""
+        try:
+            async with limit:
+                raw_data = await asyncio.to_thread(source.fetch_data, **kwargs)
+            normalized = source.normalize_data(raw_data)
+            logger.info(f"Fetched {len(normalized)} records from {source.__class__.__name__}")
+            return normalized
+        except Exception as e:
+            logger.error(f"Error fetching from {source.__class__.__name__}: {e}")
+            return []
+    
+    async def _fetch_all(self, date_range: Dict, location: Dict = None) -> List[List[Dict]]:
+        """Fetch data from all satellite and IoT sensor sources concurrently"""
+        # Bounds the number of fetches in flight across all sources
+        limit = asyncio.Semaphore(self.config.REQUESTS_PER_SECOND)
+        
+        tasks = [
+            self._fetch_one(
+                source,
+                limit,
+                start_date=date_range["start"],
+                end_date=date_range["end"],
+                location=location
+            )
+            for source in self.satellite_sources
+        ] + [
+            self._fetch_one(source, limit, location=location, date_range=date_range)
+            for source in self.iot_sources
+        ]
+        return await asyncio.gather(*tasks)
+    
+    def _process(self, records: List[Dict], fetched_at: datetime) -> List[Dict]:
+        """
+        Normalize, clean and deduplicate all fetched records in one pass
+        
+        The normalizer is vectorized, so one DataFrame over the whole list is
+        much cheaper than one per small batch. Records without a timestamp
+        are stamped with fetched_at.
+        """
+        normalized = self.normalizer.normalize(records, default_timestamp=fetched_at)
+        cleaned = self.normalizer.clean(normalized)
+        return self.normalizer.deduplicate(cleaned)
+    
     def run(self, days_back: int = 7, location: Dict = None):
         """
         Run the complete data pipeline
@@ -56,38 +124,10 @@ class DataPipeline:
                 "end": end_date.isoformat()
             }
             
-            # Fetch data from all sources
-            all_data = []
-            
-            # Fetch from satellite sources
-            logger.info("Fetching satellite data...")
-            satellite_sources = get_satellite_sources()
-            for source in satellite_sources:
-                try:
-                    raw_data = source.fetch_data(
-                        start_date=date_range["start"],
-                        end_date=date_range["end"],
-                        location=location
-                    )
-                    normalized = source.normalize_data(raw_data)
-                    all_data.extend(normalized)
-                    logger.info(f"Fetched {len(normalized)} records from {source.__class__.__name__}")
-                except Exception as e:
-                    logger.error(f"Error fetching from {source.__class__.__name__}: {e}")
-                    continue
-            
-            # Fetch from IoT sensor sources
-            logger.info("Fetching IoT sensor data...")
-            iot_sources = get_iot_sources()
-            for source in iot_sources:
-                try:
-                    raw_data = source.fetch_data(location=location, date_range=date_range)
-                    normalized = source.normalize_data(raw_data)
-                    all_data.extend(normalized)
-                    logger.info(f"Fetched {len(normalized)} records from {source.__class__.__name__}")
-                except Exception as e:
-                    logger.error(f"Error fetching from {source.__class__.__name__}: {e}")
-                    continue
+            # Fetch data from all sources concurrently
+            logger.info("Fetching satellite and IoT sensor data...")
+            results = asyncio.run(self._fetch_all(date_range, location))
+            all_data = list(itertools.chain.from_iterable(results))
             
             if not all_data:
                 logger.warning("No data fetched from any source")
@@ -95,17 +135,9 @@ class DataPipeline:
             
             logger.info(f"Total raw records fetched: {len(all_data)}")
             
-            # Normalize data
-            logger.info("Normalizing data...")
-            normalized_data = self.normalizer.normalize(all_data)
-            
-            # Clean data
-            logger.info("Cleaning data...")
-            cleaned_data = self.normalizer.clean(normalized_data)
-            
-            # Deduplicate data
-            logger.info("Deduplicating data...")
-            final_data = self.normalizer.deduplicate(cleaned_data)
+            # Normalize, clean and deduplicate data
+            logger.info("Processing data...")
+            final_data = self._process(all_data, fetched_at=end_date)
             
             # Save data
             logger.info("Saving data...")
@@ -147,6 +179,11 @@ def main():
         default=10000,
         help="Radius in meters for location filter (default: 10000)"
     )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Re-validate a 1%% sample of normalized records against the schema"
+    )
     
     args = parser.parse_args()
     
@@ -158,8 +195,11 @@ def main():
             "radius": args.radius
         }
     
-    pipeline = DataPipeline()
-    pipeline.run(days_back=args.days, location=location)
+    pipeline = DataPipeline(validate=args.validate)
+    try:
+        pipeline.run(days_back=args.days, location=location)
+    finally:
+        pipeline.close()
 
 
 if __name__ == "__main__":
@@ -2,16 +2,69 @@
 Data Normalization and Cleaning
 Standardizes units, formats, and validates data quality
 """
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Optional
 from datetime import datetime
+import numpy as np
+import orjson
+import pandas as pd
 from loguru import logger
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
 
 from config import ProcessingConfig
 
+# Candidate source fields, in order of preference
+CO2_FIELD_SCALES = {
+    "co2_tons": 1,
+    "co2": 1,
+    "carbon_tons": 1,
+    "emissions_tons": 1,
+    "co2_kg": 1e-3,
+    "co2_g": 1e-6,
+}
+TIMESTAMP_FIELDS = ["timestamp", "datetime", "date", "time", "created_at"]
+TIMESTAMP_DTYPE = "datetime64[us, UTC]"
+REQUIRED_FIELDS = frozenset(ProcessingConfig.REQUIRED_FIELDS)
+
+# Raw fields read by normalize(); anything else in an entry is ignored
+INPUT_FIELDS = [
+    "project_id", "id", "source", "location", "metadata", "verification_status", "energy_kwh",
+    *CO2_FIELD_SCALES, *TIMESTAMP_FIELDS
+]
+
+# With validation enabled, one in every VALIDATION_SAMPLE_STEP normalized
+# records is re-checked against CarbonDataPoint
+VALIDATION_SAMPLE_STEP = 100
+
+
+def first_reading_in_tons(readings: np.ndarray, scales: np.ndarray, decimals: int) -> np.ndarray:
+    """
+    Collapse a (rows x fields) matrix of CO2 readings into tons
+    
+    Each row takes its first non-NaN reading, multiplied by that field's
+    unit scale and rounded; rows without any reading become 0.
+    """
+    present = ~np.isnan(readings)
+    first = present.argmax(axis=1)
+    rows = np.arange(len(readings))
+    co2_tons = np.where(present[rows, first], readings[rows, first] * scales[first], 0.0)
+    return np.round(co2_tons, decimals)
+
+
+def serialize_normalized(rows: List[Dict]) -> bytes:
+    """
+    Serialize normalized records to JSON bytes
+    
+    Prefer this over json.dumps when sending records to a sink: orjson
+    writes NumPy scalars and arrays natively and treats naive datetimes as
+    UTC, like the rest of the pipeline.
+    """
+    return orjson.dumps(rows, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC)
+
 
 class CarbonDataPoint(BaseModel):
     """Validated carbon data point model"""
+    model_config = ConfigDict(extra="ignore", frozen=True)  # Only declared fields are kept
+    
     project_id: str = Field(..., description="Unique project identifier")
     co2_tons: float = Field(..., ge=ProcessingConfig.MIN_CO2_TONS, le=ProcessingConfig.MAX_CO2_TONS)
     timestamp: str = Field(..., description="ISO format timestamp")
@@ -20,127 +73,186 @@ class CarbonDataPoint(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
     verification_status: str = Field(default="pending")
     
-    @validator('co2_tons')
-    def round_co2_tons(cls, v):
-        """Round CO2 tons to specified decimal places"""
-        return round(v, ProcessingConfig.DEFAULT_DECIMAL_PLACES)
-    
-    @validator('timestamp')
+    @field_validator('timestamp')
+    @classmethod
     def validate_timestamp(cls, v):
         """Validate timestamp format"""
         try:
-            datetime.fromisoformat(v.replace('Z', '+00:00'))
+            datetime.fromisoformat(v)
             return v
         except ValueError:
             raise ValueError(f"Invalid timestamp format: {v}")
-    
-    class Config:
-        extra = "allow"  # Allow additional fields
+
+
+# Validates a whole list of records in a single call
+CARBON_DATA_POINTS = TypeAdapter(List[CarbonDataPoint])
 
 
 class DataNormalizer:
     """Normalize and clean carbon data"""
     
-    def __init__(self):
+    def __init__(self, validate: bool = False):
+        """
+        Args:
+            validate: Re-validate a sample of normalized records against
+                CarbonDataPoint (useful in CI; off by default)
+        """
         self.config = ProcessingConfig
+        self.validate = validate
     
-    def normalize(self, raw_data: List[Dict]) -> List[Dict]:
+    def normalize(self, raw_data: List[Dict], default_timestamp: Optional[datetime] = None) -> List[Dict]:
         """
         Normalize raw data to standard format
         
+        The whole batch is processed column-wise in a DataFrame; records are
+        only materialized back into dictionaries on return.
+        
         Args:
             raw_data: List of raw data dictionaries
+            default_timestamp: Timestamp for entries without one; naive
+                values are taken as UTC. Defaults to the current time.
             
         Returns:
             List of normalized data dictionaries
         """
-        normalized = []
-        
-        for entry in raw_data:
-            try:
-                normalized_entry = self._normalize_entry(entry)
-                if normalized_entry:
-                    normalized.append(normalized_entry)
-            except Exception as e:
-                logger.warning(f"Failed to normalize entry: {e}")
-                continue
-        
-        logger.info(f"Normalized {len(normalized)}/{len(raw_data)} entries")
-        return normalized
-    
-    def _normalize_entry(self, entry: Dict) -> Dict:
-        """Normalize a single data entry"""
-        # Extract required fields
-        project_id = entry.get("project_id", f"unknown_{entry.get('id', 'unknown')}")
-        co2_tons = self._extract_co2_tons(entry)
-        timestamp = self._extract_timestamp(entry)
-        source = entry.get("source", "unknown")
-        
-        # Build normalized entry
-        normalized = {
-            "project_id": str(project_id),
-            "co2_tons": co2_tons,
-            "timestamp": timestamp,
-            "source": str(source),
-            "location": entry.get("location", {}),
-            "metadata": entry.get("metadata", {}),
-            "verification_status": entry.get("verification_status", "pending")
-        }
-        
-        # Validate using Pydantic model
-        validated = CarbonDataPoint(**normalized)
-        return validated.dict()
-    
-    def _extract_co2_tons(self, entry: Dict) -> float:
-        """Extract and convert CO2 value to tons"""
-        # Try different field names
-        co2_fields = ["co2_tons", "co2_tons", "co2", "carbon_tons", "emissions_tons"]
-        
-        for field in co2_fields:
-            if field in entry:
-                value = float(entry[field])
-                # Convert to tons if needed
-                if "kg" in field.lower() or "kilograms" in field.lower():
-                    value = value / 1000
-                elif "g" in field.lower() or "grams" in field.lower():
-                    value = value / 1000000
-                return round(value, ProcessingConfig.DEFAULT_DECIMAL_PLACES)
+        if not raw_data:
+            logger.info("Normalized 0/0 entries")
+            return []
+        
+        # A malformed entry is skipped on its own rather than failing the whole batch
+        entries = [entry for entry in raw_data if isinstance(entry, dict)]
+        if len(entries) < len(raw_data):
+            logger.warning(f"Skipping {len(raw_data) - len(entries)} entries that are not dictionaries")
+        if not entries:
+            logger.info(f"Normalized 0/{len(raw_data)} entries")
+            return []
+        
+        # Extract only the fields we read; drop the ones absent from the whole batch
+        df = pd.DataFrame(entries, columns=INPUT_FIELDS, dtype=object).dropna(axis=1, how="all")
+        timestamps, timestamp_valid = self._extract_timestamp(df, default_timestamp or datetime.utcnow())
+        normalized = pd.DataFrame({
+            "project_id": self._extract_project_id(df),
+            "co2_tons": self._extract_co2_tons(df),
+            "timestamp": timestamps,
+            "source": self._column(df, "source", "unknown").astype(str),
+            "location": self._dict_column(df, "location"),
+            "metadata": self._dict_column(df, "metadata"),
+            "verification_status": self._column(df, "verification_status", "pending")
+        })
+        
+        co2_valid = normalized["co2_tons"].between(self.config.MIN_CO2_TONS, self.config.MAX_CO2_TONS)
+        valid = timestamp_valid & co2_valid
+        
+        # Log one summary per batch rather than a line per rejected entry
+        skipped = len(valid) - int(valid.sum())
+        if skipped:
+            logger.warning(
+                f"Failed to normalize {skipped} entries: "
+                f"{int((~co2_valid).sum())} with CO2 outside "
+                f"[{self.config.MIN_CO2_TONS}, {self.config.MAX_CO2_TONS}] tons, "
+                f"{int((~timestamp_valid).sum())} with an unparseable timestamp"
+            )
+        
+        records = normalized[valid].to_dict("records")
+        if self.validate:
+            self._validate_sample(records)
+        
+        logger.info(f"Normalized {len(records)}/{len(raw_data)} entries")
+        return records
+    
+    @staticmethod
+    def _column(df: pd.DataFrame, name: str, default: Any) -> pd.Series:
+        """Get a column with missing values replaced by a default"""
+        if name not in df:
+            return pd.Series(default, index=df.index, dtype=object)
+        return df[name].astype(object).where(df[name].notna(), default)
+    
+    @staticmethod
+    def _dict_column(df: pd.DataFrame, name: str) -> pd.Series:
+        """Get a column of dictionaries, replacing missing values with empty dicts"""
+        if name not in df:
+            return pd.Series([{} for _ in range(len(df))], index=df.index, dtype=object)
+        return pd.Series(
+            [value if isinstance(value, dict) else {} for value in df[name]],
+            index=df.index,
+            dtype=object
+        )
+    
+    def _extract_project_id(self, df: pd.DataFrame) -> pd.Series:
+        """Extract project ID, falling back to one derived from the entry id"""
+        fallback = "unknown_" + self._column(df, "id", "unknown").astype(str)
+        if "project_id" not in df:
+            return fallback
+        return df["project_id"].astype(object).where(df["project_id"].notna(), fallback).astype(str)
+    
+    def _extract_co2_tons(self, df: pd.DataFrame) -> pd.Series:
+        """Extract and convert CO2 values to tons"""
+        fields = [field for field in CO2_FIELD_SCALES if field in df]
+        readings = [pd.to_numeric(df[field], errors="coerce").to_numpy(dtype=float) for field in fields]
+        scales = [CO2_FIELD_SCALES[field] for field in fields]
         
         # If no CO2 field found, try to calculate from other metrics
-        return self._calculate_co2_from_metrics(entry)
+        readings.append(self._calculate_co2_from_metrics(df).to_numpy(dtype=float))
+        scales.append(1)
+        
+        co2_tons = first_reading_in_tons(
+            np.column_stack(readings), np.asarray(scales, dtype=float), self.config.DEFAULT_DECIMAL_PLACES
+        )
+        return pd.Series(co2_tons, index=df.index)
     
-    def _calculate_co2_from_metrics(self, entry: Dict) -> float:
+    def _calculate_co2_from_metrics(self, df: pd.DataFrame) -> pd.Series:
         """Calculate CO2 from other metrics if available"""
         # Example: Calculate from energy consumption
-        if "energy_kwh" in entry:
-            energy_kwh = float(entry["energy_kwh"])
+        if "energy_kwh" in df:
+            energy_kwh = pd.to_numeric(df["energy_kwh"], errors="coerce")
             # Standard conversion: 1 MWh ≈ 0.5 tons CO2
-            co2_tons = (energy_kwh / 1000) * 0.5
-            return round(co2_tons, ProcessingConfig.DEFAULT_DECIMAL_PLACES)
-        
-        # Return 0 if no conversion possible
-        return 0.0
-    
-    def _extract_timestamp(self, entry: Dict) -> str:
-        """Extract and normalize timestamp"""
-        timestamp_fields = ["timestamp", "datetime", "date", "time", "created_at"]
-        
-        for field in timestamp_fields:
-            if field in entry:
-                timestamp = entry[field]
-                # Convert to ISO format if needed
-                if isinstance(timestamp, datetime):
-                    return timestamp.isoformat()
-                elif isinstance(timestamp, str):
-                    # Try to parse and reformat
-                    try:
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        return dt.isoformat()
-                    except ValueError:
-                        return timestamp
-        
-        # Default to current timestamp
-        return datetime.utcnow().isoformat()
+            return (energy_kwh / 1000) * 0.5
+        
+        return pd.Series(np.nan, index=df.index)
+    
+    def _extract_timestamp(self, df: pd.DataFrame, default_timestamp: datetime):
+        """
+        Extract and normalize timestamps to UTC ISO format
+        
+        Returns:
+            Tuple of (timestamp strings, validity mask). Entries without any
+            timestamp field get default_timestamp; entries whose
+            timestamp cannot be parsed are marked invalid.
+        """
+        # Microsecond resolution holds every year 1-9999; nanoseconds overflow outside 1677-2262
+        parsed = pd.Series(pd.NaT, index=df.index, dtype=TIMESTAMP_DTYPE)
+        present = pd.Series(False, index=df.index)
+        
+        for field in TIMESTAMP_FIELDS:
+            if field in df:
+                present |= df[field].notna()
+                # cache=True parses each distinct string once per batch
+                field_parsed = pd.to_datetime(df[field], errors="coerce", utc=True, format="ISO8601", cache=True)
+                parsed = parsed.fillna(field_parsed.astype(TIMESTAMP_DTYPE))
+        
+        # Anything datetime.fromisoformat could not represent (e.g. year 0 after UTC conversion) is invalid
+        parsed = parsed.where(parsed.dt.year.between(datetime.min.year, datetime.max.year))
+        valid = parsed.notna() | ~present
+        
+        # Naive defaults are taken as UTC; aware ones are converted
+        default = pd.Timestamp(default_timestamp)
+        default = default.tz_localize("UTC") if default.tzinfo is None else default.tz_convert("UTC")
+        parsed = parsed.fillna(default)
+        
+        # Format each distinct timestamp once; rows from the same fetch window share it.
+        # isoformat() zero-pads the year and only writes microseconds when non-zero.
+        codes, uniques = pd.factorize(parsed)
+        formatted = np.array([timestamp.isoformat() for timestamp in uniques], dtype=object)
+        timestamps = pd.Series(formatted[codes], index=df.index, dtype=object)
+        
+        return timestamps, valid
+    
+    def _validate_sample(self, records: List[Dict]):
+        """Re-validate an evenly spaced sample of records against CarbonDataPoint"""
+        try:
+            CARBON_DATA_POINTS.validate_python(records[::VALIDATION_SAMPLE_STEP])
+        except ValidationError as e:
+            logger.warning(f"Normalized entries failed validation: {e}")
     
     def clean(self, data: List[Dict]) -> List[Dict]:
         """
@@ -152,46 +264,40 @@ class DataNormalizer:
         Returns:
             List of cleaned data dictionaries
         """
-        cleaned = []
+        if not data:
+            logger.info("Cleaned 0/0 entries")
+            return []
         
-        for entry in data:
-            if self._is_valid_entry(entry):
-                cleaned.append(entry)
-            else:
-                logger.debug(f"Skipping invalid entry: {entry.get('project_id', 'unknown')}")
+        valid = self._valid_mask(pd.DataFrame(data))
+        cleaned = [entry for entry, ok in zip(data, valid) if ok]
+        
+        skipped = len(data) - len(cleaned)
+        if skipped:
+            # Project IDs are only collected when DEBUG logging is enabled
+            logger.opt(lazy=True).debug(
+                f"Skipping {skipped} invalid entries: {{}}",
+                lambda: ", ".join(str(entry.get("project_id", "unknown")) for entry, ok in zip(data, valid) if not ok)
+            )
         
         logger.info(f"Cleaned {len(cleaned)}/{len(data)} entries")
         return cleaned
     
-    def _is_valid_entry(self, entry: Dict) -> bool:
-        """Check if entry is valid"""
+    def _valid_mask(self, df: pd.DataFrame) -> pd.Series:
+        """Compute a mask of valid entries"""
         # Check required fields
-        for field in ProcessingConfig.REQUIRED_FIELDS:
-            if field not in entry:
-                return False
-        
-        # Check CO2 value
-        co2_tons = entry.get("co2_tons", 0)
-        if not isinstance(co2_tons, (int, float)):
-            return False
-        
-        if co2_tons <= 0:
-            return False
+        if not REQUIRED_FIELDS.issubset(df.columns):
+            return pd.Series(False, index=df.index)
         
-        if co2_tons < ProcessingConfig.MIN_CO2_TONS:
-            return False
+        valid = df[self.config.REQUIRED_FIELDS].notna().all(axis=1)
         
-        if co2_tons > ProcessingConfig.MAX_CO2_TONS:
-            return False
+        # Check CO2 value
+        co2_tons = pd.to_numeric(df["co2_tons"], errors="coerce")
+        valid &= (co2_tons > 0) & co2_tons.between(self.config.MIN_CO2_TONS, self.config.MAX_CO2_TONS)
         
         # Check timestamp
-        try:
-            timestamp = entry.get("timestamp", "")
-            datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        except (ValueError, AttributeError):
-            return False
+        valid &= pd.to_datetime(df["timestamp"], errors="coerce", utc=True, format="ISO8601").notna()
         
-        return True
+        return valid
     
     def deduplicate(self, data: List[Dict]) -> List[Dict]:
         """
@@ -203,14 +309,11 @@ class DataNormalizer:
         Returns:
             List of deduplicated data dictionaries
         """
-        seen = set()
-        deduplicated = []
-        
+        # First entry wins for each key
+        unique = {}
         for entry in data:
-            key = (entry.get("project_id"), entry.get("timestamp"))
-            if key not in seen:
-                seen.add(key)
-                deduplicated.append(entry)
+            unique.setdefault((entry.get("project_id"), entry.get("timestamp")), entry)
+        deduplicated = list(unique.values())
         
         removed = len(data) - len(deduplicated)
         if removed > 0:
@@ -218,3 +321,6 @@ class DataNormalizer:
         
         return deduplicated
 
+
+# Shared instance; the normalizer holds no per-run state
+NORMALIZER = DataNormalizer()
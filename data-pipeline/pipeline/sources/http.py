@@ -0,0 +1,240 @@
+"""
+HTTP Session Helpers
+Pooled sessions and a response cache shared by the data sources
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import PipelineConfig
+
+
+# Response statuses worth retrying; anything else (e.g. other 4xx) fails immediately
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def create_retry(total: int = PipelineConfig.MAX_RETRIES) -> Retry:
+    """
+    Create the retry policy for idempotent GET requests
+    
+    Connection errors, read timeouts and RETRY_STATUSES are retried with
+    jittered exponential backoff, waiting as long as a Retry-After header
+    asks for. Once retries run out the last response is returned, so
+    raise_for_status() still reports the HTTP error.
+    """
+    return Retry(
+        total=total,
+        backoff_factor=1,
+        backoff_jitter=1,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+def create_session(pool_connections: int, pool_maxsize: int, headers: Optional[Dict] = None) -> requests.Session:
+    """
+    Create an HTTP session with keep-alive connection pooling and retries
+    
+    Args:
+        pool_connections: Number of per-host connection pools to cache
+        pool_maxsize: Maximum number of connections kept per host
+        headers: Optional default headers for every request
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=create_retry())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    
+    if headers:
+        session.headers.update(headers)
+    
+    return session
+
+
+class ResponseCache:
+    """
+    On-disk cache of response bodies for idempotent GET requests
+    
+    Bodies are either reused for a fixed TTL (fetch) or revalidated with
+    the server on every request through their ETag / Last-Modified
+    validators (fetch_conditional).
+    """
+    
+    # Revalidated bodies not requested for this long are dropped
+    VALIDATED_MAX_AGE = 7 * 86400
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the cache database on first use, dropping expired and unused entries"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            now = time.time()
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        body BLOB NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS validated_responses (
+                        key TEXT PRIMARY KEY,
+                        body BLOB NOT NULL,
+                        etag TEXT,
+                        last_modified TEXT,
+                        last_used REAL NOT NULL
+                    )
+                """)
+                
+                conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM validated_responses WHERE last_used <= ?",
+                    (now - self.VALIDATED_MAX_AGE,)
+                )
+            self._conn = conn
+        return self._conn
+    
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict] = None) -> str:
+        """Build the cache key of a GET request from its full URL"""
+        return requests.Request("GET", url, params=params).prepare().url
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Get a cached body, or None if it is missing or expired"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT body FROM responses WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+    
+    def set(self, key: str, body: bytes, ttl: float):
+        """Store a body for ttl seconds"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, body, expires_at) VALUES (?, ?, ?)",
+                    (key, body, time.time() + ttl)
+                )
+    
+    def fetch(
+        self,
+        get: Callable[..., requests.Response],
+        url: str,
+        ttl: float,
+        params: Optional[Dict] = None,
+        timeout: float = 30
+    ) -> bytes:
+        """
+        GET a URL through the cache
+        
+        Args:
+            get: GET function used on a cache miss, e.g. session.get
+            url: Request URL
+            ttl: Seconds a fetched body stays valid
+            params: Optional query parameters
+            timeout: Request timeout in seconds
+            
+        Returns:
+            Response body
+        """
+        key = self.make_key(url, params)
+        body = self.get(key)
+        if body is None:
+            response = get(url, params=params, timeout=timeout)
+            response.raise_for_status()
+            body = response.content
+            self.set(key, body, ttl)
+        return body
+    
+    def fetch_conditional(
+        self,
+        get: Callable[..., requests.Response],
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        timeout: float = 30
+    ) -> bytes:
+        """
+        GET a URL, revalidating the cached body with a conditional request
+        
+        When the server answers 304 Not Modified the cached body is returned
+        and nothing is downloaded. Responses without an ETag or Last-Modified
+        header are not cached.
+        
+        Args:
+            get: GET function, e.g. session.get
+            url: Request URL
+            params: Optional query parameters
+            headers: Optional request headers
+            timeout: Request timeout in seconds
+            
+        Returns:
+            Response body
+        """
+        key = self.make_key(url, params)
+        with self._lock:
+            cached = self._connect().execute(
+                "SELECT body, etag, last_modified FROM validated_responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+        
+        request_headers = dict(headers or {})
+        if cached:
+            body, etag, last_modified = cached
+            if etag:
+                request_headers["If-None-Match"] = etag
+            if last_modified:
+                request_headers["If-Modified-Since"] = last_modified
+        
+        response = get(url, params=params, headers=request_headers, timeout=timeout)
+        response.raise_for_status()
+        if cached and response.status_code == 304:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "UPDATE validated_responses SET last_used = ? WHERE key = ?",
+                        (time.time(), key)
+                    )
+            return body
+        
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        """
+                        INSERT OR REPLACE INTO validated_responses (key, body, etag, last_modified, last_used)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        (key, response.content, etag, last_modified, time.time())
+                    )
+        return response.content
+    
+    def close(self):
+        """Close the cache database"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared instance; the database is only opened once a source uses it
+RESPONSE_CACHE = ResponseCache(PipelineConfig.HTTP_CACHE_DB)
@@ -4,62 +4,186 @@ Supports air quality sensors, energy meters, and industrial emission monitors
 """
 import requests
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
+import numpy as np
+import orjson
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import List, Dict, Iterator, Optional
 from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_exponential
 
 from config import APIConfig
+from .http import RESPONSE_CACHE, create_session
+
+
+def _to_float(value) -> float:
+    """Convert a reading to float, NaN if it is not numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    """Parse an ISO timestamp as an aware datetime (naive means UTC), None if missing or invalid"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
 
 
 class IoTSensorSource:
     """Base class for IoT sensor data sources"""
     
-    def __init__(self, api_url: str, api_key: str):
+    # Prefix of the project IDs this source emits
+    PID_PREFIX = ""
+    
+    def __init__(self, api_url: str, api_key: str, session: Optional[requests.Session] = None):
         self.api_url = api_url
         self.api_key = api_key
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         } if api_key else {"Content-Type": "application/json"}
+        
+        # Use the shared session if given, otherwise keep a pooled one of our own
+        self._owns_session = session is None
+        self.session = session or create_session(pool_connections=16, pool_maxsize=32, headers=self.headers)
+        
+        # On-disk cache for public endpoints whose responses change slowly
+        self.cache = RESPONSE_CACHE
+    
+    def close(self):
+        """Release the HTTP session if this source created it"""
+        if self._owns_session:
+            self.session.close()
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def fetch_data(self, location: Optional[Dict] = None, date_range: Optional[Dict] = None) -> Dict:
         """Fetch IoT sensor data"""
         raise NotImplementedError("Subclasses must implement fetch_data")
     
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET a URL with the source's session
+        
+        Transient failures are retried by the session's adapter (see
+        create_retry), so only the request itself is repeated; decoding and
+        normalizing the response happen outside.
+        """
+        response = self.session.get(url, **kwargs)
+        response.raise_for_status()
+        return response
+    
     def normalize_data(self, raw_data: Dict) -> List[Dict]:
         """Normalize IoT sensor data to standard format"""
         raise NotImplementedError("Subclasses must implement normalize_data")
+    
+    @staticmethod
+    def _warn_non_numeric(values: List[float], field: str):
+        """Log one warning for the entries whose field was not numeric (NaN)"""
+        invalid = int(np.isnan(values).sum()) if values else 0
+        if invalid:
+            logger.warning(f"Skipping {invalid} entries with a non-numeric {field}")
 
 
 class AirQualitySource(IoTSensorSource):
     """Air quality sensor data source (OpenAQ API v2)"""
     
-    def __init__(self):
+    PID_PREFIX = "air_quality_"
+    
+    # Conversion factors to CO2 equivalent (in kg)
+    # Based on Global Warming Potential (GWP) and atmospheric concentrations
+    CONVERSION_FACTORS = {
+        "co2": 1.0,  # Already in CO2
+        "pm2.5": 0.000012,  # PM2.5 to CO2 eq (rough estimate)
+        "pm10": 0.000008,  # PM10 to CO2 eq
+        "no2": 0.00028,  # NO2 to CO2 eq (GWP: ~280 over 100 years)
+        "o3": 0.00001,  # O3 to CO2 eq
+        "so2": 0.00015,  # SO2 to CO2 eq
+        "co": 0.000003,  # CO to CO2 eq
+    }
+    
+    # Case-folded integer encoding of the parameters above; the extra trailing factor (0) is for unknown parameters
+    _PARAM_INDEX = {parameter.casefold(): i for i, parameter in enumerate(CONVERSION_FACTORS)}
+    _FACTORS = np.array([*CONVERSION_FACTORS.values(), 0.0])
+    
+    # OpenAQ page size per requested location, and the API's maximum
+    PAGE_LIMIT = 100
+    MAX_LIMIT = 10000
+    
+    # Seconds a /latest response is reused for
+    LATEST_TTL = 300
+    
+    def __init__(self, session: Optional[requests.Session] = None):
         # OpenAQ API v2 is public, no key required
-        super().__init__("https://api.openaq.org/v2", "")
+        super().__init__("https://api.openaq.org/v2", "", session)
     
     def fetch_data(self, location: Optional[Dict] = None, date_range: Optional[Dict] = None) -> Dict:
         """Fetch air quality data from OpenAQ"""
+        params = {
+            "limit": self.PAGE_LIMIT,
+            "offset": 0
+        }
+        
+        # Use location for city filtering if available
+        if location and location.get("city"):
+            params["city"] = location.get("city")
+        elif location and location.get("country"):
+            params["country"] = location.get("country")
+        
+        return self._fetch_latest(params)
+    
+    def fetch_data_batch(self, locations: List[Dict]) -> Dict:
+        """
+        Fetch air quality data for several locations in as few requests as possible
+        
+        OpenAQ accepts comma-separated city and country filters, so all city
+        locations cost one round trip and all country-only locations another.
+        Rows keep their own location name, so they can still be told apart
+        after normalization.
+        
+        Args:
+            locations: Location filters, each with a city or country. As in
+                fetch_data, a location's city takes precedence over its country.
+            
+        Returns:
+            Raw OpenAQ response with the results of all locations
+        """
+        if not locations:
+            return self.fetch_data()
+        
+        cities = [location["city"] for location in locations if location.get("city")]
+        countries = [
+            location["country"] for location in locations
+            if location.get("country") and not location.get("city")
+        ]
+        
+        skipped = len(locations) - len(cities) - len(countries)
+        if skipped:
+            logger.warning(f"Skipping {skipped} air quality locations without a city or country")
+        
+        # OpenAQ combines different filters with AND, so cities and countries need separate requests
+        results = []
+        for field, values in (("city", cities), ("country", countries)):
+            if values:
+                params = {
+                    "limit": min(self.MAX_LIMIT, self.PAGE_LIMIT * len(values)),
+                    "offset": 0,
+                    field: ",".join(values)
+                }
+                results.extend(self._fetch_latest(params).get("results", []))
+        
+        return {"results": results}
+    
+    def _fetch_latest(self, params: Dict) -> Dict:
+        """Fetch latest measurements from OpenAQ"""
         try:
             # OpenAQ API v2 endpoint - returns latest measurements
             endpoint = f"{self.api_url}/latest"
-            params = {
-                "limit": 100,
-                "offset": 0
-            }
-            
-            # Use location for city filtering if available
-            if location and location.get("city"):
-                params["city"] = location.get("city")
-            elif location and location.get("country"):
-                params["country"] = location.get("country")
-            
-            response = requests.get(endpoint, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = orjson.loads(self.cache.fetch(self._get, endpoint, self.LATEST_TTL, params=params))
             logger.info(f"Fetched air quality data: {len(data.get('results', []))} records")
             return data
             
@@ -71,69 +195,94 @@ class AirQualitySource(IoTSensorSource):
         """Normalize air quality data to standard format"""
         normalized = []
         
+        # Flatten to (entry, measurement) pairs so CO2 is computed for the whole batch at once
+        pairs = []
         for entry in raw_data.get("results", []):
             try:
-                # Extract measurements
-                measurements = entry.get("measurements", [])
-                
-                for measurement in measurements:
-                    # Convert air quality measurements to CO2 equivalent
-                    co2_tons = self._calculate_co2_equivalent(measurement)
-                    
-                    if co2_tons > 0:
-                        location_data = entry.get("coordinates", {})
-                        normalized_entry = {
-                            "project_id": f"air_quality_{entry.get('location', 'unknown')}",
-                            "co2_tons": co2_tons,
-                            "timestamp": entry.get("lastUpdated", datetime.utcnow().isoformat()),
-                            "source": "air_quality_sensor",
-                            "location": {
-                                "lat": location_data.get("latitude"),
-                                "lon": location_data.get("longitude"),
-                                "city": entry.get("city"),
-                                "country": entry.get("country")
-                            },
-                            "metadata": {
-                                "parameter": measurement.get("parameter"),
-                                "value": measurement.get("value"),
-                                "unit": measurement.get("unit"),
-                                "location_name": entry.get("location")
-                            }
-                        }
-                        normalized.append(normalized_entry)
-            except (ValueError, KeyError, TypeError) as e:
+                pairs.extend((entry, measurement) for measurement in entry.get("measurements", []))
+            except (AttributeError, TypeError) as e:
                 logger.warning(f"Skipping invalid entry: {e}")
-                continue
+        
+        if not pairs:
+            return normalized
+        
+        # Convert air quality measurements to CO2 equivalent
+        co2_tons = self._calculate_co2_equivalent([measurement for _, measurement in pairs])
+        now_iso = datetime.utcnow().isoformat()
+        
+        invalid = int(np.isnan(co2_tons).sum())
+        if invalid:
+            logger.warning(f"Skipping {invalid} measurements with a non-numeric value")
+        
+        for i in np.flatnonzero(co2_tons > 0):
+            entry, measurement = pairs[i]
+            location_data = entry.get("coordinates", {})
+            normalized_entry = {
+                "project_id": self.PID_PREFIX + str(entry.get("location", "unknown")),
+                "co2_tons": float(co2_tons[i]),
+                "timestamp": entry.get("lastUpdated") or now_iso,
+                "source": "air_quality_sensor",
+                "location": {
+                    "lat": location_data.get("latitude"),
+                    "lon": location_data.get("longitude"),
+                    "city": entry.get("city"),
+                    "country": entry.get("country")
+                },
+                "metadata": {
+                    "parameter": measurement.get("parameter"),
+                    "value": measurement.get("value"),
+                    "unit": measurement.get("unit"),
+                    "location_name": entry.get("location")
+                }
+            }
+            normalized.append(normalized_entry)
         
         return normalized
     
-    def _calculate_co2_equivalent(self, measurement: Dict) -> float:
-        """Calculate CO2 equivalent from air quality measurements"""
-        parameter = measurement.get("parameter", "").lower()
-        value = float(measurement.get("value", 0))
-        
-        # Conversion factors to CO2 equivalent (in kg)
-        # Based on Global Warming Potential (GWP) and atmospheric concentrations
-        conversion_factors = {
-            "co2": 1.0,  # Already in CO2
-            "pm2.5": 0.000012,  # PM2.5 to CO2 eq (rough estimate)
-            "pm10": 0.000008,  # PM10 to CO2 eq
-            "no2": 0.00028,  # NO2 to CO2 eq (GWP: ~280 over 100 years)
-            "o3": 0.00001,  # O3 to CO2 eq
-            "so2": 0.00015,  # SO2 to CO2 eq
-            "co": 0.000003,  # CO to CO2 eq
-        }
+    def _calculate_co2_equivalent(self, measurements: List[Dict]) -> np.ndarray:
+        """
+        Calculate CO2 equivalent (in tons) for a batch of air quality measurements
         
-        factor = conversion_factors.get(parameter, 0)
-        co2_kg = value * factor  # Value in kg CO2 equivalent
+        Measurements of unknown parameters come out as 0 without their value
+        being parsed; measurements with a non-numeric value come out as NaN.
+        """
+        unknown = len(self._PARAM_INDEX)
+        params = np.fromiter(
+            (self._param_index(m.get("parameter", "")) for m in measurements),
+            dtype=np.intp,
+            count=len(measurements)
+        )
+        values = np.fromiter(
+            (
+                _to_float(m.get("value", 0)) if param != unknown else 0.0
+                for m, param in zip(measurements, params)
+            ),
+            dtype=np.float64,
+            count=len(measurements)
+        )
+        co2_kg = values * self._FACTORS[params]  # Value in kg CO2 equivalent
         return co2_kg / 1000  # Convert to tons
+    
+    @classmethod
+    def _param_index(cls, parameter) -> int:
+        """Encode a parameter name, trying it as-is before case-folding it"""
+        # OpenAQ already reports lowercase names, so the exact lookup usually hits
+        index = cls._PARAM_INDEX.get(parameter) if isinstance(parameter, str) else None
+        if index is None:
+            index = cls._PARAM_INDEX.get(str(parameter).casefold(), len(cls._PARAM_INDEX))
+        return index
 
 
 class EnergyMeterSource(IoTSensorSource):
     """Smart energy meter data source"""
     
-    def __init__(self):
-        super().__init__(APIConfig.ENERGY_METER_API_URL, APIConfig.ENERGY_METER_API_KEY)
+    PID_PREFIX = "energy_meter_"
+    
+    # Standard conversion: 1 MWh ≈ 0.5 tons CO2 (varies by grid), i.e. 0.5 / 1000 per kWh
+    KWH_TO_CO2_TONS = 5e-4
+    
+    def __init__(self, session: Optional[requests.Session] = None):
+        super().__init__(APIConfig.ENERGY_METER_API_URL, APIConfig.ENERGY_METER_API_KEY, session)
     
     def fetch_data(self, location: Optional[Dict] = None, date_range: Optional[Dict] = None) -> Dict:
         """Fetch energy meter data"""
@@ -152,11 +301,11 @@ class EnergyMeterSource(IoTSensorSource):
                     "end_date": date_range.get("end")
                 })
             
-            response = requests.get(endpoint, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
+            response = self._get(endpoint, headers=self.headers, params=params, timeout=30)
             
-            logger.info(f"Fetched energy meter data: {len(response.json().get('readings', []))} records")
-            return response.json()
+            data = orjson.loads(response.content)
+            logger.info(f"Fetched energy meter data: {len(data.get('readings', []))} records")
+            return data
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching energy meter data: {e}")
@@ -164,46 +313,64 @@ class EnergyMeterSource(IoTSensorSource):
     
     def normalize_data(self, raw_data: Dict) -> List[Dict]:
         """Normalize energy meter data to standard format"""
-        normalized = []
+        readings = raw_data.get("readings", [])
+        now_iso = datetime.utcnow().isoformat()
         
-        for reading in raw_data.get("readings", []):
-            try:
-                # Convert energy consumption to CO2 equivalent
-                # Standard conversion: 1 MWh ≈ 0.5 tons CO2 (varies by grid)
-                energy_kwh = float(reading.get("energy_kwh", 0))
-                co2_tons = (energy_kwh / 1000) * 0.5  # Convert to MWh then to CO2 tons
-                
-                if co2_tons > 0:
-                    normalized_entry = {
-                        "project_id": f"energy_meter_{reading.get('meter_id', 'unknown')}",
-                        "co2_tons": co2_tons,
-                        "timestamp": reading.get("timestamp", datetime.utcnow().isoformat()),
-                        "source": "energy_meter",
-                        "location": reading.get("location", {}),
-                        "metadata": {
-                            "energy_kwh": energy_kwh,
-                            "meter_id": reading.get("meter_id")
-                        }
-                    }
-                    normalized.append(normalized_entry)
-            except (ValueError, KeyError) as e:
-                logger.warning(f"Skipping invalid entry: {e}")
-                continue
+        # Convert energy consumption to CO2 equivalent
+        energies_kwh = [_to_float(reading.get("energy_kwh", 0)) for reading in readings]
+        self._warn_non_numeric(energies_kwh, "energy_kwh")
         
-        return normalized
+        return [
+            {
+                "project_id": self.PID_PREFIX + str(reading.get("meter_id", "unknown")),
+                "co2_tons": co2_tons,
+                "timestamp": reading.get("timestamp") or now_iso,
+                "source": "energy_meter",
+                "location": reading.get("location", {}),
+                "metadata": {
+                    "energy_kwh": energy_kwh,
+                    "meter_id": reading.get("meter_id")
+                }
+            }
+            for reading, energy_kwh in zip(readings, energies_kwh)
+            if (co2_tons := energy_kwh * self.KWH_TO_CO2_TONS) > 0
+        ]
 
 
 class EmissionMonitorSource(IoTSensorSource):
     """Industrial emission monitor data source"""
     
-    def __init__(self):
-        super().__init__(APIConfig.EMISSION_MONITOR_API_URL, APIConfig.EMISSION_MONITOR_API_KEY)
+    PID_PREFIX = "emission_monitor_"
     
-    def fetch_data(self, location: Optional[Dict] = None, date_range: Optional[Dict] = None) -> Dict:
-        """Fetch industrial emission monitor data"""
+    # Seconds the server may hold a long-poll request open in stream_data
+    LONG_POLL_WAIT = 30
+    
+    # Bounds on the time between polls; empty or failed polls double it up to the maximum
+    MIN_POLL_INTERVAL = 1
+    MAX_POLL_INTERVAL = 60
+    
+    def __init__(self, session: Optional[requests.Session] = None):
+        super().__init__(APIConfig.EMISSION_MONITOR_API_URL, APIConfig.EMISSION_MONITOR_API_KEY, session)
+    
+    def fetch_data(
+        self,
+        location: Optional[Dict] = None,
+        date_range: Optional[Dict] = None,
+        wait: Optional[int] = None
+    ) -> Dict:
+        """
+        Fetch industrial emission monitor data
+        
+        Args:
+            location: Optional location filter with a facility_id
+            date_range: Optional date range with start and end
+            wait: Seconds the server may hold the request open until new
+                emissions arrive (long-poll); None returns immediately
+        """
         try:
             endpoint = f"{self.api_url}/emissions"
             params = {}
+            timeout = 30
             
             if location:
                 params.update({
@@ -216,51 +383,115 @@ class EmissionMonitorSource(IoTSensorSource):
                     "end_date": date_range.get("end")
                 })
             
-            response = requests.get(endpoint, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
+            if wait:
+                params["wait"] = wait
+                timeout += wait
+            
+            response = self._get(endpoint, headers=self.headers, params=params, timeout=timeout)
             
-            logger.info(f"Fetched emission monitor data: {len(response.json().get('emissions', []))} records")
-            return response.json()
+            data = orjson.loads(response.content)
+            logger.info(f"Fetched emission monitor data: {len(data.get('emissions', []))} records")
+            return data
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching emission monitor data: {e}")
             raise
     
+    def stream_data(self, location: Optional[Dict] = None, since: Optional[str] = None) -> Iterator[List[Dict]]:
+        """
+        Long-poll for new emissions, yielding each batch of normalized rows
+        
+        Each request stays open for up to LONG_POLL_WAIT seconds, so an idle
+        feed costs one request per wait period rather than one per polling
+        tick. Polls are at least MIN_POLL_INTERVAL apart, even against a
+        server that ignores wait, and back off after empty or failed polls.
+        Runs until the consumer stops iterating.
+        
+        Args:
+            location: Optional location filter with a facility_id
+            since: Optional ISO timestamp to start from
+        """
+        since_at = _parse_timestamp(since)
+        interval = self.MIN_POLL_INTERVAL
+        while True:
+            started = time.monotonic()
+            date_range = {"start": since} if since else None
+            try:
+                emissions = self.fetch_data(location, date_range, wait=self.LONG_POLL_WAIT).get("emissions", [])
+            except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+                logger.warning(f"Emission monitor poll failed: {e}")
+                emissions = []
+            
+            # Only keep emissions newer than the last batch; the server may repeat its boundary row
+            stamped = [(_parse_timestamp(emission.get("timestamp")), emission) for emission in emissions]
+            if since_at:
+                stamped = [(at, emission) for at, emission in stamped if at is None or at > since_at]
+            
+            normalized = self.normalize_data({"emissions": [emission for _, emission in stamped]})
+            
+            # Advance only on timestamps sent by the server, never on the fallback of undated rows
+            dated = [(at, emission["timestamp"]) for at, emission in stamped if at is not None]
+            if dated:
+                since_at, since = max(dated, key=lambda pair: pair[0])
+            
+            if normalized:
+                interval = self.MIN_POLL_INTERVAL
+                yield normalized
+            else:
+                interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+            
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    
     def normalize_data(self, raw_data: Dict) -> List[Dict]:
         """Normalize emission monitor data to standard format"""
-        normalized = []
+        emissions = raw_data.get("emissions", [])
+        now_iso = datetime.utcnow().isoformat()
         
-        for emission in raw_data.get("emissions", []):
-            try:
-                co2_tons = float(emission.get("co2_tons", 0))
-                
-                if co2_tons > 0:
-                    normalized_entry = {
-                        "project_id": f"emission_monitor_{emission.get('monitor_id', 'unknown')}",
-                        "co2_tons": co2_tons,
-                        "timestamp": emission.get("timestamp", datetime.utcnow().isoformat()),
-                        "source": "emission_monitor",
-                        "location": emission.get("location", {}),
-                        "metadata": {
-                            "monitor_id": emission.get("monitor_id"),
-                            "facility_id": emission.get("facility_id"),
-                            "pollutant_type": emission.get("pollutant_type")
-                        }
-                    }
-                    normalized.append(normalized_entry)
-            except (ValueError, KeyError) as e:
-                logger.warning(f"Skipping invalid entry: {e}")
-                continue
+        co2_values = [_to_float(emission.get("co2_tons", 0)) for emission in emissions]
+        self._warn_non_numeric(co2_values, "co2_tons")
         
-        return normalized
+        return [
+            {
+                "project_id": self.PID_PREFIX + str(emission.get("monitor_id", "unknown")),
+                "co2_tons": co2_tons,
+                "timestamp": emission.get("timestamp") or now_iso,
+                "source": "emission_monitor",
+                "location": emission.get("location", {}),
+                "metadata": {
+                    "monitor_id": emission.get("monitor_id"),
+                    "facility_id": emission.get("facility_id"),
+                    "pollutant_type": emission.get("pollutant_type")
+                }
+            }
+            for emission, co2_tons in zip(emissions, co2_values)
+            if co2_tons > 0
+        ]
 
 
 class WeatherDataSource(IoTSensorSource):
     """Weather and climate data source (NOAA)"""
     
-    def __init__(self):
+    PID_PREFIX = "weather_"
+    
+    # Estimate CO2 from heating/cooling needs (simplified)
+    # Average: 1 ton CO2 per 1000 sq ft per year for heating/cooling
+    # Normalized to per-period basis
+    HEATING_BELOW_F = 65
+    COOLING_ABOVE_F = 78
+    HEATING_CO2_TONS_PER_F = 0.0001
+    COOLING_CO2_TONS_PER_F = 0.00008
+    BASELINE_CO2_TONS = 0.00001  # Minimal HVAC
+    
+    # Upper bound on concurrent grid point lookups in fetch_data_batch
+    MAX_BATCH_WORKERS = 8
+    
+    # Seconds responses are reused for; grid points are effectively static
+    POINTS_TTL = 86400
+    FORECAST_TTL = 300
+    
+    def __init__(self, session: Optional[requests.Session] = None):
         # NOAA API is public, no key required
-        super().__init__("https://api.weather.gov", "")
+        super().__init__("https://api.weather.gov", "", session)
     
     def fetch_data(self, location: Optional[Dict] = None, date_range: Optional[Dict] = None) -> Dict:
         """Fetch weather data from NOAA"""
@@ -269,14 +500,8 @@ class WeatherDataSource(IoTSensorSource):
                 logger.warning("Weather data requires latitude and longitude")
                 return {"features": []}
             
-            lat = location.get("lat")
-            lon = location.get("lon")
-            
             # Get grid point data
-            points_endpoint = f"{self.api_url}/points/{lat},{lon}"
-            points_response = requests.get(points_endpoint, timeout=30)
-            points_response.raise_for_status()
-            points_data = points_response.json()
+            points_data = self.fetch_points(location.get("lat"), location.get("lon"))
             
             # Get forecast URL from points data
             forecast_url = points_data.get("properties", {}).get("forecast")
@@ -285,9 +510,7 @@ class WeatherDataSource(IoTSensorSource):
                 return {"features": []}
             
             # Get forecast data
-            forecast_response = requests.get(forecast_url, timeout=30)
-            forecast_response.raise_for_status()
-            forecast_data = forecast_response.json()
+            forecast_data = self.fetch_forecast(forecast_url)
             
             logger.info(f"Fetched weather data: {len(forecast_data.get('properties', {}).get('periods', []))} periods")
             return forecast_data
@@ -296,36 +519,86 @@ class WeatherDataSource(IoTSensorSource):
             logger.error(f"Error fetching weather data: {e}")
             raise
     
+    def fetch_points(self, lat: float, lon: float) -> Dict:
+        """Fetch the NOAA grid point metadata for a coordinate (cached for a day)"""
+        points_endpoint = f"{self.api_url}/points/{lat},{lon}"
+        return orjson.loads(self.cache.fetch(self._get, points_endpoint, self.POINTS_TTL))
+    
+    def fetch_forecast(self, forecast_url: str) -> Dict:
+        """Fetch a NOAA forecast (cached for a few minutes)"""
+        return orjson.loads(self.cache.fetch(self._get, forecast_url, self.FORECAST_TTL))
+    
+    def fetch_data_batch(self, locations: List[Dict]) -> Dict:
+        """
+        Fetch weather data for several locations concurrently
+        
+        NOAA has no multi-point query, so each location's /points and
+        forecast requests run on their own thread over the shared session.
+        Locations that fail are logged and left out.
+        
+        Args:
+            locations: Location filters, each with lat and lon
+            
+        Returns:
+            Forecast payload with the periods of the fetched locations, each
+            tagged with its location's lat and lon
+        """
+        if not locations:
+            return {"properties": {"periods": []}}
+        
+        periods = []
+        with ThreadPoolExecutor(max_workers=min(len(locations), self.MAX_BATCH_WORKERS)) as executor:
+            futures = [executor.submit(self.fetch_data, location) for location in locations]
+            for location, future in zip(locations, futures):
+                try:
+                    forecast = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching weather data for {location}: {e}")
+                    continue
+                
+                # Locations share period start times, so each period carries its coordinates
+                point = {"lat": location.get("lat"), "lon": location.get("lon")}
+                periods.extend(
+                    {**period, "location": point}
+                    for period in forecast.get("properties", {}).get("periods", [])
+                )
+        
+        return {"properties": {"periods": periods}}
+    
     def normalize_data(self, raw_data: Dict) -> List[Dict]:
         """Normalize weather data to standard format"""
         normalized = []
+        now_iso = datetime.utcnow().isoformat()
         
         try:
             periods = raw_data.get("properties", {}).get("periods", [])
             
-            for period in periods:
+            # Convert temperature and conditions to carbon impact estimate for all periods at once
+            temps = np.fromiter(
+                (_to_float(period.get("temperature", 70)) for period in periods),
+                dtype=np.float64,
+                count=len(periods)
+            )
+            co2_tons = self._co2_from_temperatures(temps)
+            
+            invalid = int(np.isnan(temps).sum())
+            if invalid:
+                logger.warning(f"Skipping {invalid} weather entries with a non-numeric temperature")
+            
+            for i in np.flatnonzero(~np.isnan(temps)):
+                period = periods[i]
                 try:
-                    # Convert temperature and conditions to carbon impact estimate
-                    temp_f = period.get("temperature", 70)
-                    
-                    # Estimate CO2 from heating/cooling needs (simplified)
-                    # Average: 1 ton CO2 per 1000 sq ft per year for heating/cooling
-                    # Normalized to per-period basis
-                    if temp_f < 65:  # Heating needed
-                        co2_tons = (65 - temp_f) * 0.0001
-                    elif temp_f > 78:  # Cooling needed
-                        co2_tons = (temp_f - 78) * 0.00008
-                    else:
-                        co2_tons = 0.00001  # Minimal HVAC
-                    
+                    # Only periods from fetch_data_batch carry a location
+                    location = period.get("location") or {}
+                    point_id = f"{location.get('lat')}_{location.get('lon')}_" if location else ""
                     normalized_entry = {
-                        "project_id": f"weather_{period.get('startTime', 'unknown')[:10]}",
-                        "co2_tons": co2_tons,
-                        "timestamp": period.get("startTime", datetime.utcnow().isoformat()),
+                        "project_id": self.PID_PREFIX + point_id + period.get("startTime", "unknown")[:10],
+                        "co2_tons": float(co2_tons[i]),
+                        "timestamp": period.get("startTime") or now_iso,
                         "source": "weather_station",
-                        "location": {},
+                        "location": location,
                         "metadata": {
-                            "temperature": temp_f,
+                            "temperature": period.get("temperature", 70),
                             "humidity": period.get("relativeHumidity", {}).get("value"),
                             "wind_speed": period.get("windSpeed", ""),
                             "sky_condition": period.get("skyCover", ""),
@@ -340,23 +613,75 @@ class WeatherDataSource(IoTSensorSource):
             logger.warning(f"Error parsing weather data: {e}")
         
         return normalized
+    
+    def _co2_from_temperatures(self, temps: np.ndarray) -> np.ndarray:
+        """Estimate CO2 (in tons) from heating/cooling needs for an array of temperatures"""
+        return np.where(
+            temps < self.HEATING_BELOW_F,
+            (self.HEATING_BELOW_F - temps) * self.HEATING_CO2_TONS_PER_F,  # Heating needed
+            np.where(
+                temps > self.COOLING_ABOVE_F,
+                (temps - self.COOLING_ABOVE_F) * self.COOLING_CO2_TONS_PER_F,  # Cooling needed
+                self.BASELINE_CO2_TONS  # Minimal HVAC
+            )
+        )
 
 
-def get_iot_sources() -> List[IoTSensorSource]:
-    """Get all configured IoT sensor data sources"""
+def get_iot_sources(session: Optional[requests.Session] = None) -> List[IoTSensorSource]:
+    """
+    Get all configured IoT sensor data sources
+    
+    Args:
+        session: Optional HTTP session shared by all sources
+    """
     sources = []
     
     # Air quality is often public, so we include it even without API key
-    sources.append(AirQualitySource())
+    sources.append(AirQualitySource(session))
     
     # Weather data is public
-    sources.append(WeatherDataSource())
+    sources.append(WeatherDataSource(session))
     
     if APIConfig.ENERGY_METER_API_KEY:
-        sources.append(EnergyMeterSource())
+        sources.append(EnergyMeterSource(session))
     
     if APIConfig.EMISSION_MONITOR_API_KEY:
-        sources.append(EmissionMonitorSource())
+        sources.append(EmissionMonitorSource(session))
     
     return sources
 
+
+def fetch_all_parallel(
+    sources: List[IoTSensorSource],
+    location: Optional[Dict] = None,
+    date_range: Optional[Dict] = None
+) -> Dict[str, Dict]:
+    """
+    Fetch raw data from several IoT sources concurrently
+    
+    Each fetch runs on its own thread; requests releases the GIL while
+    waiting on the socket, and sources sharing a session reuse its pooled
+    connections. Sources that fail are logged and left out.
+    
+    Args:
+        sources: Sources to fetch from
+        location: Optional location filter passed to every source
+        date_range: Optional date range passed to every source
+        
+    Returns:
+        Raw payloads keyed by source class name
+    """
+    if not sources:
+        return {}
+    
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(8, len(sources))) as executor:
+        futures = {executor.submit(source.fetch_data, location, date_range): source for source in sources}
+        for future in as_completed(futures):
+            name = futures[future].__class__.__name__
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching from {name}: {e}")
+    
+    return results
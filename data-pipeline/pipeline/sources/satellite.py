@@ -4,26 +4,60 @@ Supports Planet Labs, Sentinel-2, and Landsat
 """
 import requests
 import os
+import numpy as np
+import orjson
+import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from operator import itemgetter
+from typing import List, Dict, Optional, Tuple
 from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_exponential
 
-from config import APIConfig
+from config import APIConfig, PipelineConfig
+from .http import RESPONSE_CACHE, create_session
+
+
+def _round_to_days(start_date: str, end_date: str) -> Tuple[str, str]:
+    """
+    Widen an ISO date range to whole UTC days
+    
+    Pipeline runs pass ranges ending at the current time. Rounding them
+    keeps the search URL, and so its cache key and ETag, the same for
+    every run on the same day.
+    
+    Returns:
+        Tuple of (start of the first day, start of the day after the last)
+        as RFC 3339 timestamps
+    """
+    start = datetime.fromisoformat(start_date).date()
+    end = datetime.fromisoformat(end_date).date() + timedelta(days=1)
+    return f"{start.isoformat()}T00:00:00Z", f"{end.isoformat()}T00:00:00Z"
 
 
 class SatelliteDataSource:
     """Base class for satellite data sources"""
     
-    def __init__(self, api_url: str, api_key: str):
+    def __init__(self, api_url: str, api_key: str, session: Optional[requests.Session] = None):
         self.api_url = api_url
         self.api_key = api_key
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
-        }
+        } if api_key else {"Content-Type": "application/json"}
+        
+        # Use the shared session if given, otherwise keep a pooled one of our own
+        self._owns_session = session is None
+        self.session = session or create_session(pool_connections=8, pool_maxsize=16, headers=self.headers)
+        
+        # STAC searches are revalidated with ETag / Last-Modified instead of re-downloaded
+        self.cache = RESPONSE_CACHE
+    
+    def close(self):
+        """Release the HTTP session if this source created it"""
+        if self._owns_session:
+            self.session.close()
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def fetch_data(self, start_date: str, end_date: str, location: Optional[Dict] = None) -> Dict:
         """Fetch satellite data for a given date range and location"""
         raise NotImplementedError("Subclasses must implement fetch_data")
@@ -36,8 +70,15 @@ class SatelliteDataSource:
 class PlanetLabsSource(SatelliteDataSource):
     """Planet Labs satellite data source"""
     
-    def __init__(self):
-        super().__init__(APIConfig.PLANET_LABS_API_URL, APIConfig.PLANET_LABS_API_KEY)
+    # Fields read from each result, fetched with a single C-level lookup
+    FIELDS = ("co2_tons", "timestamp", "location", "satellite", "resolution", "cloud_cover")
+    _get_fields = itemgetter(*FIELDS)
+    
+    # Caps requests in flight at the provider's limit; shared by every instance in the process
+    _sem = threading.BoundedSemaphore(APIConfig.PLANET_LABS_MAX_CONCURRENCY)
+    
+    def __init__(self, session: Optional[requests.Session] = None):
+        super().__init__(APIConfig.PLANET_LABS_API_URL, APIConfig.PLANET_LABS_API_KEY, session)
     
     def fetch_data(self, start_date: str, end_date: str, location: Optional[Dict] = None) -> Dict:
         """Fetch Planet Labs satellite data"""
@@ -56,11 +97,13 @@ class PlanetLabsSource(SatelliteDataSource):
                     "radius": location.get("radius", 1000)  # meters
                 })
             
-            response = requests.get(endpoint, headers=self.headers, params=params, timeout=30)
+            with self._sem:
+                response = self.session.get(endpoint, headers=self.headers, params=params, timeout=30)
             response.raise_for_status()
             
-            logger.info(f"Fetched Planet Labs data: {len(response.json().get('results', []))} records")
-            return response.json()
+            data = orjson.loads(response.content)
+            logger.info(f"Fetched Planet Labs data: {len(data.get('results', []))} records")
+            return data
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching Planet Labs data: {e}")
@@ -69,19 +112,29 @@ class PlanetLabsSource(SatelliteDataSource):
     def normalize_data(self, raw_data: Dict) -> List[Dict]:
         """Normalize Planet Labs data to standard format"""
         normalized = []
+        defaults = dict.fromkeys(self.FIELDS)
+        defaults.update(co2_tons=0, timestamp=datetime.utcnow().isoformat())
         
         for entry in raw_data.get("results", []):
             try:
+                try:
+                    co2_tons, timestamp, location, satellite, resolution, cloud_cover = self._get_fields(entry)
+                except KeyError:
+                    # Only entries missing a field pay for merging in the defaults
+                    co2_tons, timestamp, location, satellite, resolution, cloud_cover = self._get_fields(
+                        {**defaults, "location": {}, **entry}
+                    )
+                
                 normalized_entry = {
                     "project_id": entry.get("project_id", f"planet_{entry.get('id', 'unknown')}"),
-                    "co2_tons": float(entry.get("co2_tons", 0)),
-                    "timestamp": entry.get("timestamp", datetime.utcnow().isoformat()),
+                    "co2_tons": float(co2_tons),
+                    "timestamp": timestamp,
                     "source": "planet_labs",
-                    "location": entry.get("location", {}),
+                    "location": location,
                     "metadata": {
-                        "satellite": entry.get("satellite"),
-                        "resolution": entry.get("resolution"),
-                        "cloud_cover": entry.get("cloud_cover")
+                        "satellite": satellite,
+                        "resolution": resolution,
+                        "cloud_cover": cloud_cover
                     }
                 }
                 normalized.append(normalized_entry)
@@ -95,17 +148,21 @@ class PlanetLabsSource(SatelliteDataSource):
 class Sentinel2Source(SatelliteDataSource):
     """Sentinel-2 (ESA) satellite data source"""
     
-    def __init__(self):
-        super().__init__(APIConfig.SENTINEL2_API_URL, APIConfig.SENTINEL2_API_KEY)
+    # Shared by every instance, like PlanetLabsSource._sem
+    _sem = threading.BoundedSemaphore(APIConfig.SENTINEL2_MAX_CONCURRENCY)
+    
+    def __init__(self, session: Optional[requests.Session] = None):
+        super().__init__(APIConfig.SENTINEL2_API_URL, APIConfig.SENTINEL2_API_KEY, session)
     
     def fetch_data(self, start_date: str, end_date: str, location: Optional[Dict] = None) -> Dict:
         """Fetch Sentinel-2 satellite data"""
         try:
             # Example endpoint - adjust based on actual Sentinel-2 API
             endpoint = f"{self.api_url}/search"
+            start, end = _round_to_days(start_date, end_date)
             params = {
-                "start": start_date,
-                "end": end_date,
+                "start": start,
+                "end": end,
                 "platformname": "Sentinel-2"
             }
             
@@ -114,11 +171,11 @@ class Sentinel2Source(SatelliteDataSource):
                     "bbox": f"{location.get('lon')},{location.get('lat')}"
                 })
             
-            response = requests.get(endpoint, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            
-            logger.info(f"Fetched Sentinel-2 data: {len(response.json().get('features', []))} records")
-            return response.json()
+            with self._sem:
+                body = self.cache.fetch_conditional(self.session.get, endpoint, params=params, headers=self.headers)
+            data = orjson.loads(body)
+            logger.info(f"Fetched Sentinel-2 data: {len(data.get('features', []))} records")
+            return data
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching Sentinel-2 data: {e}")
@@ -153,19 +210,31 @@ class Sentinel2Source(SatelliteDataSource):
 class LandsatSource(SatelliteDataSource):
     """Landsat (USGS) satellite data source"""
     
-    def __init__(self):
+    # Estimate CO2 sequestration: healthy forest sequesters ~2.4 tons/hectare/year
+    # Landsat scene is 185x185 km = 34,225 hectares
+    # Per scene, assuming 30% vegetation cover and discounting for cloud cover
+    SCENE_HECTARES = 34225
+    SEQUESTRATION_TONS_PER_HECTARE = 2.4
+    VEGETATION_COVER = 0.3
+    DEFAULT_CLOUD_COVER = 50
+    
+    # Shared by every instance, like PlanetLabsSource._sem
+    _sem = threading.BoundedSemaphore(APIConfig.LANDSAT_MAX_CONCURRENCY)
+    
+    def __init__(self, session: Optional[requests.Session] = None):
         # Use USGS STAC API (free, no key required)
-        super().__init__("https://landsatlook.usgs.gov/stac-server", "")
+        super().__init__("https://landsatlook.usgs.gov/stac-server", "", session)
     
     def fetch_data(self, start_date: str, end_date: str, location: Optional[Dict] = None) -> Dict:
         """Fetch Landsat satellite data from USGS STAC"""
         try:
             # Search endpoint for Landsat Collection 2
             endpoint = f"{self.api_url}/search"
+            start, end = _round_to_days(start_date, end_date)
             
             params = {
                 "collections": ["landsat-c2l2"],
-                "datetime": f"{start_date}/{end_date}",
+                "datetime": f"{start}/{end}",
                 "limit": 50
             }
             
@@ -180,10 +249,9 @@ class LandsatSource(SatelliteDataSource):
                 ]
                 params["bbox"] = bbox
             
-            response = requests.get(endpoint, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            with self._sem:
+                body = self.cache.fetch_conditional(self.session.get, endpoint, params=params)
+            data = orjson.loads(body)
             logger.info(f"Fetched Landsat data: {len(data.get('features', []))} records")
             return data
             
@@ -195,28 +263,32 @@ class LandsatSource(SatelliteDataSource):
         """Normalize Landsat data to standard format"""
         normalized = []
         
-        for feature in raw_data.get("features", []):
+        features = raw_data.get("features", [])
+        properties = [feature.get("properties", {}) for feature in features]
+        
+        # Calculate rough carbon impact from cloud cover for all scenes at once
+        cloud_cover = pd.to_numeric(
+            pd.Series([props.get("eo:cloud_cover", self.DEFAULT_CLOUD_COVER) for props in properties], dtype=object),
+            errors="coerce"
+        ).to_numpy(dtype=np.float64)
+        co2_tons = self._estimate_co2(cloud_cover)
+        
+        invalid = int(np.isnan(cloud_cover).sum())
+        if invalid:
+            logger.warning(f"Skipping {invalid} Landsat entries with a non-numeric cloud cover")
+        
+        for i in np.flatnonzero(~np.isnan(cloud_cover)):
+            feature, props = features[i], properties[i]
             try:
-                properties = feature.get("properties", {})
                 geometry = feature.get("geometry", {})
                 
                 # Extract coordinates from geometry
                 coordinates = geometry.get("coordinates", [[[[0, 0]]]])[0][0]
                 
-                # Calculate rough carbon impact from cloud cover and vegetation indices
-                # Lower cloud cover and healthier vegetation (higher NDVI) = better carbon sequestration
-                cloud_cover = float(properties.get("eo:cloud_cover", 50))
-                
-                # Estimate CO2 sequestration: healthy forest sequesters ~2.4 tons/hectare/year
-                # Landsat scene is 185x185 km = 34,225 hectares
-                # Per scene, assuming 30% vegetation cover and discounting for cloud cover
-                vegetation_factor = (100 - cloud_cover) / 100 * 0.3
-                co2_tons = 34225 * 2.4 * vegetation_factor / 365 / 1000  # Daily estimate
-                
                 normalized_entry = {
                     "project_id": f"landsat_{feature.get('id', 'unknown')}",
-                    "co2_tons": max(0, co2_tons),
-                    "timestamp": properties.get("datetime", datetime.utcnow().isoformat()),
+                    "co2_tons": float(co2_tons[i]),
+                    "timestamp": props.get("datetime", datetime.utcnow().isoformat()),
                     "source": "landsat",
                     "location": {
                         "lat": coordinates[1] if len(coordinates) > 1 else 0,
@@ -225,9 +297,9 @@ class LandsatSource(SatelliteDataSource):
                     },
                     "metadata": {
                         "satellite": "Landsat-8/9",
-                        "cloud_cover": cloud_cover,
-                        "asset": properties.get("landsat:product_id", ""),
-                        "processing_level": properties.get("eo:processing_level", "L2")
+                        "cloud_cover": float(cloud_cover[i]),
+                        "asset": props.get("landsat:product_id", ""),
+                        "processing_level": props.get("eo:processing_level", "L2")
                     }
                 }
                 normalized.append(normalized_entry)
@@ -236,20 +308,74 @@ class LandsatSource(SatelliteDataSource):
                 continue
         
         return normalized
+    
+    def _estimate_co2(self, cloud_cover: np.ndarray) -> np.ndarray:
+        """Estimate daily CO2 sequestration (in tons) per scene from an array of cloud cover percentages"""
+        # Lower cloud cover = more visible vegetation = better carbon sequestration
+        vegetation_factor = (100 - cloud_cover) / 100 * self.VEGETATION_COVER
+        co2_tons = self.SCENE_HECTARES * self.SEQUESTRATION_TONS_PER_HECTARE * vegetation_factor / 365 / 1000
+        return np.maximum(co2_tons, 0)
 
 
-def get_satellite_sources() -> List[SatelliteDataSource]:
-    """Get all configured satellite data sources"""
+def get_satellite_sources(session: Optional[requests.Session] = None) -> List[SatelliteDataSource]:
+    """
+    Get all configured satellite data sources
+    
+    Args:
+        session: Optional HTTP session shared by all sources
+    """
     sources = []
     
     # Landsat is free and doesn't require API key
-    sources.append(LandsatSource())
+    sources.append(LandsatSource(session))
     
     if APIConfig.PLANET_LABS_API_KEY:
-        sources.append(PlanetLabsSource())
+        sources.append(PlanetLabsSource(session))
     
     if APIConfig.SENTINEL2_API_KEY:
-        sources.append(Sentinel2Source())
+        sources.append(Sentinel2Source(session))
     
     return sources
 
+
+def fetch_all(
+    sources: List[SatelliteDataSource],
+    start_date: str,
+    end_date: str,
+    location: Optional[Dict] = None,
+    max_workers: int = PipelineConfig.MAX_SATELLITE_WORKERS
+) -> Dict[str, Dict]:
+    """
+    Fetch raw data from several satellite sources concurrently
+    
+    Wall-clock time is that of the slowest provider rather than the sum of
+    all of them. Sources that fail are logged and left out, so one bad
+    provider doesn't hold back the others.
+    
+    Args:
+        sources: Sources to fetch from
+        start_date: Start of the date range (ISO format)
+        end_date: End of the date range (ISO format)
+        location: Optional location filter passed to every source
+        max_workers: Maximum number of concurrent fetches
+        
+    Returns:
+        Raw payloads keyed by source class name, in the order of sources
+    """
+    if not sources:
+        return {}
+    
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(sources))) as executor:
+        futures = [
+            (source, executor.submit(source.fetch_data, start_date, end_date, location))
+            for source in sources
+        ]
+        for source, future in futures:
+            name = source.__class__.__name__
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching from {name}: {e}")
+    
+    return results
@@ -2,13 +2,18 @@
 Data Storage Module
 Supports JSON, CSV, and SQLite storage
 """
-import json
-import csv
+import numbers
+import os
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 from loguru import logger
+import orjson
+import pandas as pd
 import shutil
 
 from config import StorageConfig
@@ -19,6 +24,8 @@ class DataStorage:
     
     def __init__(self):
         self.config = StorageConfig
+        self._lock = threading.Lock()  # Serializes writers sharing this instance
+        self._conn: Optional[sqlite3.Connection] = None  # Opened on first use, kept across saves
         self._ensure_directories()
     
     def _ensure_directories(self):
@@ -41,23 +48,44 @@ class DataStorage:
         if formats is None:
             formats = ["json", "csv", "sqlite"]
         
-        # Create backup before saving
-        if self.config.ENABLE_BACKUP:
-            self._create_backup()
-        
-        if "json" in formats:
-            self._save_json(data)
-        
-        if "csv" in formats:
-            self._save_csv(data)
-        
-        if "sqlite" in formats:
-            self._save_sqlite(data)
+        with self._lock:
+            # Create backup before saving; a JSON file about to be rewritten is moved, not copied
+            json_backup = None
+            if self.config.ENABLE_BACKUP:
+                json_backup = self._create_backup(move_json="json" in formats)
+            
+            writers = {
+                "json": partial(self._save_json, backup_path=json_backup),
+                "csv": self._save_csv,
+                "sqlite": self._save_sqlite
+            }
+            selected = [writer for name, writer in writers.items() if name in formats]
+            
+            # Each format writes its own file, so JSON/CSV encoding overlaps the SQLite commit.
+            # Only the sqlite writer touches the shared connection; the lock is held throughout.
+            if selected:
+                with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+                    futures = [executor.submit(writer, data) for writer in selected]
+                    for future in futures:
+                        future.result()
+            
+            if self.config.ENABLE_BACKUP:
+                self._cleanup_old_backups()
         
         logger.info(f"Saved {len(data)} records in formats: {formats}")
     
-    def _save_json(self, data: List[Dict]):
-        """Save data as JSON"""
+    def _save_json(self, data: List[Dict], backup_path: Optional[Path] = None):
+        """
+        Save data as JSON
+        
+        The file is written to a temporary sibling and renamed into place, so
+        readers never see a partial file.
+        
+        Args:
+            data: List of data dictionaries
+            backup_path: If given, the previous JSON file is renamed here
+                before being replaced
+        """
         try:
             output = {
                 "metadata": {
@@ -68,8 +96,18 @@ class DataStorage:
                 "data": data
             }
             
-            with open(self.config.JSON_OUTPUT, "w") as f:
-                json.dump(output, f, indent=4, default=str)
+            # NumPy values from the vectorized sources are written as numbers, not strings
+            options = (
+                orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+            )
+            tmp_path = self.config.JSON_OUTPUT.with_name(f"{self.config.JSON_OUTPUT.name}.tmp")
+            tmp_path.write_bytes(orjson.dumps(output, default=str, option=options))
+            
+            # Same-filesystem renames only update directory entries; no bytes are copied
+            if backup_path is not None and self.config.JSON_OUTPUT.exists():
+                os.replace(self.config.JSON_OUTPUT, backup_path)
+                os.utime(backup_path)  # Backups are pruned by mtime; date it like the copied ones
+            os.replace(tmp_path, self.config.JSON_OUTPUT)
             
             logger.info(f"Saved {len(data)} records to JSON: {self.config.JSON_OUTPUT}")
         except Exception as e:
@@ -83,22 +121,18 @@ class DataStorage:
                 logger.warning("No data to save to CSV")
                 return
             
-            # Get all unique keys from all records
+            # Flatten nested dictionaries for CSV, collecting the columns as we go
             fieldnames = set()
-            for record in data:
-                fieldnames.update(record.keys())
-            
-            # Flatten nested dictionaries for CSV
             flattened_data = []
             for record in data:
                 flattened = self._flatten_dict(record)
                 flattened_data.append(flattened)
                 fieldnames.update(flattened.keys())
             
-            with open(self.config.CSV_OUTPUT, "w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=sorted(fieldnames))
-                writer.writeheader()
-                writer.writerows(flattened_data)
+            # pandas writes rows in C; object dtype keeps each value formatted as str() would,
+            # and the CRLF terminator matches the csv module's default dialect
+            df = pd.DataFrame(flattened_data, columns=sorted(fieldnames), dtype=object)
+            df.to_csv(self.config.CSV_OUTPUT, index=False, lineterminator="\r\n")
             
             logger.info(f"Saved {len(data)} records to CSV: {self.config.CSV_OUTPUT}")
         except Exception as e:
@@ -107,22 +141,54 @@ class DataStorage:
     
     def _flatten_dict(self, d: Dict, parent_key: str = "", sep: str = "_") -> Dict:
         """Flatten nested dictionary"""
-        items = []
-        for k, v in d.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.extend(self._flatten_dict(v, new_key, sep=sep).items())
-            elif isinstance(v, list):
-                # Convert list to string representation
-                items.append((new_key, json.dumps(v)))
-            else:
-                items.append((new_key, v))
-        return dict(items)
+        flattened = {}
+        # Walk nested dictionaries with an explicit stack, writing leaves straight into the result
+        stack = [(d, parent_key)]
+        while stack:
+            current, prefix = stack.pop()
+            for k, v in current.items():
+                new_key = f"{prefix}{sep}{k}" if prefix else k
+                if isinstance(v, dict):
+                    stack.append((v, new_key))
+                elif isinstance(v, list):
+                    # Convert list to string representation
+                    flattened[new_key] = orjson.dumps(v, default=str).decode()
+                elif isinstance(v, numbers.Real) and v != v:
+                    # to_csv would blank NaN like a missing key; keep the "nan" the csv module wrote
+                    flattened[new_key] = "nan"
+                else:
+                    flattened[new_key] = v
+        return flattened
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the long-lived SQLite connection, opening it in WAL mode on first use
+        
+        The connection is shared between threads; callers hold self._lock
+        while using it.
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(self.config.SQLITE_DB, check_same_thread=False)
+            # WAL avoids rewriting a rollback journal on every commit; with WAL,
+            # synchronous=NORMAL only syncs at checkpoints and is still corruption-safe
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache, kept warm between saves
+            self._conn = conn
+        return self._conn
+    
+    def close(self):
+        """Close the SQLite connection; it is reopened on next use"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
     
     def _save_sqlite(self, data: List[Dict]):
         """Save data to SQLite database"""
         try:
-            conn = sqlite3.connect(self.config.SQLITE_DB)
+            conn = self._connect()
             cursor = conn.cursor()
             
             # Create table if it doesn't exist
@@ -149,74 +215,98 @@ class DataStorage:
                 CREATE INDEX IF NOT EXISTS idx_timestamp ON carbon_data(timestamp)
             """)
             
-            # Insert data
-            for record in data:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO carbon_data 
-                    (project_id, co2_tons, timestamp, source, location, metadata, verification_status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
+            # Insert all records in a single transaction; NumPy values are encoded as in _save_json
+            options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+            rows = (
+                (
                     record.get("project_id"),
                     record.get("co2_tons"),
                     record.get("timestamp"),
                     record.get("source"),
-                    json.dumps(record.get("location", {})),
-                    json.dumps(record.get("metadata", {})),
+                    orjson.dumps(record.get("location", {}), default=str, option=options).decode(),
+                    orjson.dumps(record.get("metadata", {}), default=str, option=options).decode(),
                     record.get("verification_status", "pending")
-                ))
-            
-            conn.commit()
-            conn.close()
+                )
+                for record in data
+            )
+            with conn:
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO carbon_data 
+                    (project_id, co2_tons, timestamp, source, location, metadata, verification_status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, rows)
             
             logger.info(f"Saved {len(data)} records to SQLite: {self.config.SQLITE_DB}")
         except Exception as e:
             logger.error(f"Error saving to SQLite: {e}")
             raise
     
-    def _create_backup(self):
-        """Create backup of existing data files"""
+    def _create_backup(self, move_json: bool = False) -> Optional[Path]:
+        """
+        Create backup of existing data files
+        
+        Args:
+            move_json: The JSON output is about to be rewritten. Rather than
+                copying it now, leave it for _save_json to rename into the
+                returned backup path.
+        
+        Returns:
+            The JSON backup path if move_json is set and a JSON file exists, else None
+        """
+        json_backup = None
         try:
             timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
             
-            # Backup JSON
+            # Backup JSON (copyfile uses the kernel's in-place copy where available)
             if self.config.JSON_OUTPUT.exists():
                 backup_path = self.config.BACKUP_DIR / f"carbon_data_{timestamp}.json"
-                shutil.copy2(self.config.JSON_OUTPUT, backup_path)
+                if move_json:
+                    json_backup = backup_path
+                else:
+                    shutil.copyfile(self.config.JSON_OUTPUT, backup_path)
             
             # Backup CSV
             if self.config.CSV_OUTPUT.exists():
                 backup_path = self.config.BACKUP_DIR / f"carbon_data_{timestamp}.csv"
-                shutil.copy2(self.config.CSV_OUTPUT, backup_path)
+                shutil.copyfile(self.config.CSV_OUTPUT, backup_path)
             
-            # Backup SQLite
+            # Backup SQLite through the online backup API, which includes pages still in the WAL
             if self.config.SQLITE_DB.exists():
                 backup_path = self.config.BACKUP_DIR / f"carbon_data_{timestamp}.db"
-                shutil.copy2(self.config.SQLITE_DB, backup_path)
-            
-            # Clean up old backups
-            self._cleanup_old_backups()
+                self._backup_sqlite(backup_path)
             
         except Exception as e:
             logger.warning(f"Error creating backup: {e}")
+        
+        return json_backup
+    
+    def _backup_sqlite(self, backup_path: Path):
+        """Copy the SQLite database to backup_path without blocking other readers"""
+        target = sqlite3.connect(backup_path)
+        try:
+            self._connect().backup(target)
+        finally:
+            target.close()
     
     def _cleanup_old_backups(self):
         """Remove old backup files, keeping only the most recent ones"""
         try:
-            backups = sorted(self.config.BACKUP_DIR.glob("*"), key=lambda p: p.stat().st_mtime, reverse=True)
+            # scandir entries carry their file type from the directory listing itself
+            with os.scandir(self.config.BACKUP_DIR) as entries:
+                backups = [(entry.stat().st_mtime, entry.path) for entry in entries if entry.is_file()]
+            backups.sort(reverse=True)
             
-            if len(backups) > self.config.MAX_BACKUPS:
-                for old_backup in backups[self.config.MAX_BACKUPS:]:
-                    old_backup.unlink()
-                    logger.debug(f"Removed old backup: {old_backup}")
+            for _, old_backup in backups[self.config.MAX_BACKUPS:]:
+                os.unlink(old_backup)
+                logger.debug(f"Removed old backup: {old_backup}")
         except Exception as e:
             logger.warning(f"Error cleaning up backups: {e}")
     
     def load_json(self) -> List[Dict]:
         """Load data from JSON file"""
         try:
-            with open(self.config.JSON_OUTPUT, "r") as f:
-                data = json.load(f)
-                return data.get("data", [])
+            data = orjson.loads(self.config.JSON_OUTPUT.read_bytes())
+            return data.get("data", [])
         except FileNotFoundError:
             logger.warning(f"JSON file not found: {self.config.JSON_OUTPUT}")
             return []
@@ -227,16 +317,15 @@ class DataStorage:
     def load_sqlite(self, limit: int = None) -> List[Dict]:
         """Load data from SQLite database"""
         try:
-            conn = sqlite3.connect(self.config.SQLITE_DB)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
             query = "SELECT * FROM carbon_data ORDER BY timestamp DESC"
             if limit:
                 query += f" LIMIT {limit}"
             
-            cursor.execute(query)
-            rows = cursor.fetchall()
+            with self._lock:
+                cursor = self._connect().cursor()
+                cursor.row_factory = sqlite3.Row
+                cursor.execute(query)
+                rows = cursor.fetchall()
             
             data = []
             for row in rows:
@@ -245,15 +334,17 @@ class DataStorage:
                     "co2_tons": row["co2_tons"],
                     "timestamp": row["timestamp"],
                     "source": row["source"],
-                    "location": json.loads(row["location"]) if row["location"] else {},
-                    "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
+                    "location": orjson.loads(row["location"]) if row["location"] else {},
+                    "metadata": orjson.loads(row["metadata"]) if row["metadata"] else {},
                     "verification_status": row["verification_status"]
                 }
                 data.append(record)
             
-            conn.close()
             return data
         except Exception as e:
             logger.error(f"Error loading from SQLite: {e}")
             return []
 
+
+# Shared instance for callers that don't need their own storage
+STORAGE = DataStorage()
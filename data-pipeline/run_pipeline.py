@@ -4,13 +4,8 @@ Real-world data pipeline runner
 Collects actual carbon data from OpenAQ, NOAA, and Landsat
 """
 import sys
-from pathlib import Path
 from loguru import logger
 
-# Add parent directory to path
-parent_dir = Path(__file__).parent
-sys.path.insert(0, str(parent_dir))
-
 from pipeline.main import DataPipeline
 
 
@@ -39,7 +34,10 @@ def main():
             "lon": -122.4194
         }
         
-        data = pipeline.run(days_back=7, location=location)
+        try:
+            data = pipeline.run(days_back=7, location=location)
+        finally:
+            pipeline.close()
         
         if data:
             print(f"\n✅ Pipeline completed successfully!")